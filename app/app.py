@@ -6,6 +6,7 @@ import numpy
 from app.grid import GridButton
 from structure.block import Block
 from structure.board import Board
+from solver.client import SolveClient, SolveServiceError
 from solver.solver import minimum_steps_bfs
 from PIL import ImageColor
 
@@ -15,14 +16,16 @@ class WuwaBoardGameApp(QMainWindow):
     COLOR_MAP = [code for _, code in ImageColor.colormap.items()]
     shuffle(COLOR_MAP)
 
-    def __init__(self, board: numpy.ndarray):
+    def __init__(self, board: numpy.ndarray, solve_client: Optional[SolveClient] = None):
         super().__init__()
         self.init_board = board
+        self.solve_client = solve_client
+        """可选的本地求解服务, 为 None 或者服务不可用时在当前进程内求解"""
         self.setWindowTitle("鸣潮-兽痕解析")
         self.resize(1280, 720)
 
         # 利用 solver 找出最佳步数
-        self.optimal_steps, _ = minimum_steps_bfs(self.init_board)
+        self.optimal_steps, _ = self.find_optimal_steps()
         self.remaining_steps = self.optimal_steps
         self.board = Board.build_from_array(self.init_board)
 
@@ -30,8 +33,18 @@ class WuwaBoardGameApp(QMainWindow):
         self.selected_block: Optional[Block] = None
         self.valid_actions: list = []
         self.buttons = {}
+        self.cell_index: dict[Point, Block] = self.board.build_cell_index()
+        """坐标 -> 区块 的索引, 每次棋盘变化后重建"""
         self.build_gui()
 
+    def find_optimal_steps(self):
+        if self.solve_client is not None:
+            try:
+                return self.solve_client.minimum_steps(self.init_board)
+            except (OSError, SolveServiceError) as e:
+                print("求解服务不可用, 改为本地求解: ", e)
+        return minimum_steps_bfs(self.init_board)
+
     def build_gui(self):
         # 在画面右上角构造一个 QLabel 显示剩余步数，初始值为 optimal_steps
         self.steps_label = QLabel(f"剩余步数: {self.remaining_steps}", self)
@@ -55,14 +68,7 @@ class WuwaBoardGameApp(QMainWindow):
                     button.set_invalid_style()
                 else:
                     # 设置按钮的颜色为棋子的颜色
-                    block = self.board.find_block_by_coord((i, j))
-                    if block:
-                        color_code = self.COLOR_MAP[(block.color - 1) % len(self.COLOR_MAP)]
-                        if not isinstance(color_code, str):
-                            raise Exception("color code 需要是 str 形式")
-                        button.set_block_style(color_code, block.active)
-                    else:
-                        button.set_empty_style()
+                    self.paint_cell(button, self.cell_index.get((i, j)))
 
                     # 添加点击按钮事件
                     button.clicked.connect(self.on_button_clicked)
@@ -87,7 +93,7 @@ class WuwaBoardGameApp(QMainWindow):
         if self.selected_block is None:
             # 如果选择的按钮上面有棋子，则获取这个按钮对应的棋子的区块
             # 计算并缓存对应的 valid_actions
-            block = self.board.find_block_by_coord(coord)
+            block = self.cell_index.get(coord)
             if block and block.active:
                 self.selected_coord = coord
                 self.selected_block = block
@@ -126,26 +132,43 @@ class WuwaBoardGameApp(QMainWindow):
 
             self.refresh()
 
+    @staticmethod
+    def cell_state(block: Optional[Block]) -> Optional[tuple[int, bool]]:
+        """格子的显示状态, 只由区块的颜色和 active 决定"""
+        if block is None:
+            return None
+        return (block.color, block.active)
+
+    def paint_cell(self, button: GridButton, block: Optional[Block]):
+        if block:
+            color_code = self.COLOR_MAP[(block.color - 1) % len(self.COLOR_MAP)]
+            if not isinstance(color_code, str):
+                raise Exception("color code 需要是 str 形式")
+            button.set_block_style(color_code, block.active)
+        else:
+            button.set_empty_style()
+
     def refresh(self):
-        """刷新UI"""
-        height, width = self.board.shape
-        for i in range(height):
-            for j in range(width):
-                if self.board.grid_mask[i, j] == 0:
-                    continue
-                    
-                button = self.buttons[(i, j)]
-                block = self.board.find_block_by_coord((i, j))
-                
-                if block:
-                    color_code = self.COLOR_MAP[(block.color - 1) % len(self.COLOR_MAP)]
-                    button.set_block_style(color_code, block.active)
-                else:
-                    button.set_empty_style()
+        """
+        刷新UI
+        对比新旧两个棋盘的索引, 只重绘颜色或 active 状态发生变化的格子
+        """
+        old_index = self.cell_index
+        new_index = self.board.build_cell_index()
+
+        for coord in old_index.keys() | new_index.keys():
+            new_block = new_index.get(coord)
+            if self.cell_state(old_index.get(coord)) == self.cell_state(new_block):
+                continue
+            self.paint_cell(self.buttons[coord], new_block)
+
+        self.cell_index = new_index
 
     def reset_game(self):
         """重置游戏状态"""
         self.remaining_steps = self.optimal_steps
         self.board = Board.build_from_array(self.init_board)
+        self.selected_coord = None
         self.selected_block = None
+        self.valid_actions = []
         self.refresh()
\ No newline at end of file
@@ -1,48 +1,73 @@
+from typing import Optional
 from PyQt5.QtWidgets import QPushButton
 from PyQt5.QtCore import QSize, Qt
 from structure.data_type import Point
 
+EMPTY_STYLE = """
+    QPushButton {
+        background-color: lightgray;
+        border: 1px solid darkgray;
+    }
+    QPushButton:hover {
+        background-color: #e0e0e0;
+        border: 2px solid darkgray;
+    }
+"""
+
+INVALID_STYLE = """
+    QPushButton {
+        background-color: black;
+        border: none;
+    }
+"""
+
 class GridButton(QPushButton):
+    STYLE_CACHE: dict[tuple[str, bool], str] = {}
+    """(color_code, is_active) -> stylesheet 的缓存, 所有按钮共享"""
+
     def __init__(self, position: Point, size: int = 60, parent=None):
         super().__init__("", parent)
         self.coord = position
         self.setFixedSize(QSize(size, size))
-        
-    def set_block_style(self, color_code: str, is_active: bool):
-        if is_active:
-            self.setStyleSheet(f"""
-                QPushButton {{
-                    background-color: {color_code};
-                    border: 3px solid black;
-                }}
-            """)
-        else:
-            self.setStyleSheet(f"""
+        self.style_key: Optional[tuple] = None
+        """当前按钮的样式, 样式不变时跳过 setStyleSheet"""
+
+    @classmethod
+    def block_stylesheet(cls, color_code: str, is_active: bool) -> str:
+        key = (color_code, is_active)
+        stylesheet = cls.STYLE_CACHE.get(key)
+        if stylesheet is None:
+            border_color = "black" if is_active else "gray"
+            stylesheet = f"""
                 QPushButton {{
                     background-color: {color_code};
-                    border: 3px solid gray;
+                    border: 3px solid {border_color};
                 }}
-            """)
-        self.setEnabled(is_active)
-        
-    def set_empty_style(self):
-        self.setStyleSheet("""
-            QPushButton {
-                background-color: lightgray;
-                border: 1px solid darkgray;
-            }
-            QPushButton:hover {
-                background-color: #e0e0e0;
-                border: 2px solid darkgray;
-            }
-        """)
-        self.setEnabled(True)
-        
-    def set_invalid_style(self):
-        self.setStyleSheet("""
-            QPushButton {
-                background-color: black;
-                border: none;
-            }
-        """)
-        self.setEnabled(False)
\ No newline at end of file
+            """
+            cls.STYLE_CACHE[key] = stylesheet
+        return stylesheet
+
+    def apply_style(self, key: tuple, stylesheet: str, enabled: bool) -> bool:
+        """
+        样式发生变化时才重新设置 stylesheet
+
+        Returns
+        -------
+        是否真正进行了重绘
+        """
+        if self.style_key == key:
+            return False
+        self.style_key = key
+        self.setStyleSheet(stylesheet)
+        self.setEnabled(enabled)
+        return True
+
+    def set_block_style(self, color_code: str, is_active: bool) -> bool:
+        return self.apply_style(("block", color_code, is_active),
+                                self.block_stylesheet(color_code, is_active), is_active)
+
+    def set_empty_style(self) -> bool:
+        return self.apply_style(("empty",), EMPTY_STYLE, True)
+
+    def set_invalid_style(self) -> bool:
+        return self.apply_style(("invalid",), INVALID_STYLE, False)
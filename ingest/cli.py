@@ -0,0 +1,84 @@
+"""
+批量从截图中识别棋盘
+
+用法
+----
+    python -m ingest screenshots/ > boards.jsonl
+    python -m ingest screenshots/ --crop 420,180,1080,720 --rows 8 --cols 8 | python -m solver
+    python -m ingest ingest/fixtures/app_board_6_2.png --crop 9,35,494,494
+
+识别结果可以用 python -m ingest.roundtrip 检查 (渲染 -> 识别, 以及 ingest/fixtures 下的截图)
+
+逐个读取图片, 每识别一张就输出一行 {"name": 图片路径, "board": [[...]]},
+与 python -m solver 的输入格式相同; 无法识别的图片输出到标准错误, 并继续处理其他图片
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Iterator, Optional
+from ingest.screenshot import RecognitionConfig, recognize_file
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".webp")
+
+
+def iter_images(paths: list[str], recursive: bool = False) -> Iterator[str]:
+    """按文件名顺序逐个列出图片, 目录下的文件只在需要时才读取"""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+
+        if recursive:
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(IMAGE_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            for name in sorted(os.listdir(path)):
+                full_path = os.path.join(path, name)
+                if name.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(full_path):
+                    yield full_path
+
+
+def parse_crop(value: str) -> tuple[int, int, int, int]:
+    parts = [int(v) for v in value.split(",")]
+    if len(parts) != 4:
+        raise argparse.ArgumentTypeError("--crop 的格式为 x,y,width,height")
+    return parts[0], parts[1], parts[2], parts[3]
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m ingest", description="从截图中识别鸣潮-兽痕棋盘")
+    parser.add_argument("paths", nargs="+", help="图片文件或者包含图片的目录")
+    parser.add_argument("-r", "--recursive", action="store_true", help="递归处理子目录")
+    parser.add_argument("--crop", type=parse_crop, default=None, help="棋盘在截图中的范围 x,y,width,height")
+    parser.add_argument("--rows", type=int, default=None, help="棋盘的行数, 不指定时自动识别")
+    parser.add_argument("--cols", type=int, default=None, help="棋盘的列数, 不指定时自动识别")
+    parser.add_argument("--color-tolerance", type=float, default=RecognitionConfig.color_tolerance,
+                        help="颜色差小于这个值的棋子为同一种颜色, 不指定时根据图片中棋子内部的颜色波动估计")
+    parser.add_argument("--dark-threshold", type=float, default=RecognitionConfig.dark_threshold,
+                        help="角落亮度 (0~255) 低于这个值的格子为不可放置的区域, 不指定时根据角落颜色的聚类判断")
+    parser.add_argument("--dark-ratio", type=float, default=RecognitionConfig.dark_ratio,
+                        help="最暗的中性色亮度低于背景亮度的这个倍数时, 为不可放置的区域")
+    parser.add_argument("--piece-threshold", type=float, default=RecognitionConfig.piece_threshold,
+                        help="中心与角落, 或者角落与背景的颜色差大于这个值的格子有棋子")
+    parser.add_argument("--edge-threshold", type=float, default=RecognitionConfig.edge_threshold,
+                        help="棋子边缘两侧的颜色差大于这个值的格子有棋子, 用于识别与背景颜色相近的棋子")
+    args = parser.parse_args(argv)
+    config = RecognitionConfig(color_tolerance=args.color_tolerance, dark_threshold=args.dark_threshold,
+                               dark_ratio=args.dark_ratio, piece_threshold=args.piece_threshold,
+                               edge_threshold=args.edge_threshold)
+
+    failed = False
+    for path in iter_images(args.paths, args.recursive):
+        try:
+            board = recognize_file(path, args.rows, args.cols, args.crop, config)
+        except Exception as e:
+            failed = True
+            print(f"{path}: {e}", file=sys.stderr, flush=True)
+            continue
+        print(json.dumps({"name": path, "board": board.tolist()}), flush=True)
+    return 1 if failed else 0
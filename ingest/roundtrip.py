@@ -0,0 +1,167 @@
+"""
+截图识别的回归检查
+    1. 渲染 -> 识别: 用 Board.visualization 渲染预设棋盘和随机棋盘 (每轮用不同的种子重新打乱调色板,
+       随机激活一部分区块), 再用 recognize_board 识别, 与原棋盘比较 (颜色编号可以不同);
+       可以选择深色主题 (白色背景和网格线换成深色背景和浅色网格线) 和 JPEG 压缩
+    2. fixtures 目录下的真实截图, 与 fixtures.json 中记录的棋盘比较
+
+用法
+----
+    python -m ingest.roundtrip
+    python -m ingest.roundtrip --runs 30 --boards 30 --grid-size 50 --jpeg 90 --theme dark
+
+注意: 纯白色并且不活跃的棋子与背景完全相同, 调色板中不同名称的相同颜色 (例如 lightgray/lightgrey) 也无法区分,
+这两种情况在渲染的图片中本来就无法识别, 会计入失败的数量
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+from collections import Counter
+from typing import Iterator, Optional
+import cv2
+import numpy
+import preset
+import render.renderer as renderer
+from render.renderer import GRID_COLOR
+from structure.board import Board
+from ingest.screenshot import RecognitionConfig, recognize_board, recognize_file
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PRESETS = ["board_6_1", "board_6_2", "board_6_3", "board_6_c1", "board_6_c2"]
+
+DARK_BACKGROUND = (32, 32, 32)
+DARK_GRID_COLOR = (120, 120, 120)
+
+
+def canonical(board: numpy.ndarray) -> numpy.ndarray:
+    """按照行优先第一次出现的顺序重新给颜色编号, 用于比较颜色编号不同的棋盘"""
+    result = board.copy()
+    mapping: dict[int, int] = {}
+    for index, value in enumerate(board.flat):
+        if value > 0:
+            result.flat[index] = mapping.setdefault(int(value), len(mapping) + 1)
+    return result
+
+
+def random_board(rng: random.Random) -> numpy.ndarray:
+    height, width = rng.randint(4, 9), rng.randint(4, 9)
+    board = numpy.zeros((height, width), dtype=int)
+    board[numpy.array([[rng.random() < 0.1 for _ in range(width)] for _ in range(height)])] = -1
+    colors = rng.randint(2, 6)
+    for _ in range(rng.randint(3, height * width // 2)):
+        x, y = rng.randrange(height), rng.randrange(width)
+        if board[x, y] == 0:
+            board[x, y] = rng.randint(1, colors)
+    return board
+
+
+def iter_boards(rng: random.Random, count: int) -> Iterator[numpy.ndarray]:
+    for index in range(count):
+        if index < len(PRESETS):
+            yield numpy.array(getattr(preset, PRESETS[index]))
+        else:
+            yield random_board(rng)
+
+
+def render_case(board: Board, grid_size: int, theme: str, jpeg: Optional[int]) -> numpy.ndarray:
+    image = board.visualization(grid_size)
+    if theme == "dark":
+        image = image.copy()
+        image[(image == 255).all(axis=-1)] = DARK_BACKGROUND
+        image[(image == GRID_COLOR).all(axis=-1)] = DARK_GRID_COLOR
+    if jpeg is not None:
+        _, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, jpeg])
+        image = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+    return image
+
+
+def compare(expected: numpy.ndarray, actual: numpy.ndarray) -> Optional[str]:
+    """相同时返回 None, 否则返回失败的原因"""
+    if actual.shape != expected.shape:
+        return "网格大小不同"
+    if ((actual == -1) != (expected == -1)).any():
+        return "不可放置的区域不同"
+    if ((actual > 0) != (expected > 0)).any():
+        return "棋子的位置不同"
+    if (canonical(actual) != canonical(expected)).any():
+        return "棋子的颜色分组不同"
+    return None
+
+
+def check_roundtrip(runs: int, boards: int, grid_size: int, theme: str, jpeg: Optional[int],
+                    config: RecognitionConfig) -> tuple[int, int, Counter]:
+    """
+    Returns
+    -------
+    (成功的数量, 总数, 失败原因的计数)
+    """
+    passed = 0
+    total = 0
+    reasons: Counter = Counter()
+    for run in range(runs):
+        # 每轮用固定的种子打乱调色板, 结果可以复现
+        renderer.COLORS.sort()
+        random.Random(run).shuffle(renderer.COLORS)
+        renderer.DEFAULT_RENDERERS.clear()
+        rng = random.Random(run)
+
+        run_passed = 0
+        for expected in iter_boards(rng, boards):
+            board = Board.build_from_array(expected)
+            for block in board.blocks:
+                block.active = rng.random() < 0.5
+            image = render_case(board, grid_size, theme, jpeg)
+            try:
+                reason = compare(expected, recognize_board(image, config=config))
+            except Exception as e:
+                reason = str(e)
+            total += 1
+            if reason is None:
+                run_passed += 1
+            else:
+                reasons[reason] += 1
+        passed += run_passed
+        print(f"run {run}: {run_passed}/{boards}", flush=True)
+    return passed, total, reasons
+
+
+def check_fixtures(config: RecognitionConfig) -> bool:
+    with open(os.path.join(FIXTURES_DIR, "fixtures.json"), encoding="utf-8") as f:
+        fixtures = json.load(f)
+
+    all_passed = True
+    for fixture in fixtures:
+        path = os.path.join(FIXTURES_DIR, fixture["image"])
+        crop = tuple(fixture["crop"]) if fixture.get("crop") else None
+        try:
+            reason = compare(numpy.array(fixture["board"]), recognize_file(path, crop=crop, config=config))
+        except Exception as e:
+            reason = str(e)
+        all_passed = all_passed and reason is None
+        print(f"fixture {fixture['image']}: {'ok' if reason is None else reason}", flush=True)
+    return all_passed
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m ingest.roundtrip", description="截图识别的回归检查")
+    parser.add_argument("--runs", type=int, default=10, help="打乱调色板的轮数")
+    parser.add_argument("--boards", type=int, default=30, help="每轮的棋盘数量, 前 5 个为预设棋盘")
+    parser.add_argument("--grid-size", type=int, default=50)
+    parser.add_argument("--theme", choices=["light", "dark"], default="light")
+    parser.add_argument("--jpeg", type=int, default=None, help="用这个质量进行 JPEG 压缩后再识别")
+    args = parser.parse_args(argv)
+    config = RecognitionConfig()
+
+    passed, total, reasons = check_roundtrip(args.runs, args.boards, args.grid_size, args.theme, args.jpeg, config)
+    print(f"渲染 -> 识别: {passed}/{total}")
+    for reason, count in reasons.most_common():
+        print(f"    {reason}: {count}")
+    fixtures_passed = check_fixtures(config)
+    return 0 if fixtures_passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+"""
+从截图中识别棋盘
+    1. 根据格子边界上的图像梯度估计行数和列数, 确定网格
+    2. 批量采样每个格子中心和角落的颜色, 以及以格子中心为圆心的一组射线上的颜色
+    3. 将所有格子角落的颜色聚类, 找出空位的背景颜色; 明显比背景暗的中性色 (黑色、灰色) 的一类为不可放置的区域 (-1),
+       不依赖固定的亮度, 深色主题的截图也可以识别;
+       中心与角落颜色差别明显, 沿各个方向都能找到棋子边缘 (颜色与背景相近的棋子),
+       或者角落的颜色与背景差别明显 (棋子填满整个格子) 的格子为棋子, 其余为空位 (0);
+       棋子按照颜色相近程度分组, 依次编号为 1, 2, 3 ...
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+import cv2
+import numpy
+
+
+@dataclass
+class Grid:
+    cell_height: float
+    cell_width: float
+    rows: int
+    cols: int
+
+
+@dataclass
+class RecognitionConfig:
+    dark_threshold: Optional[float] = None
+    """角落的亮度 (0~255) 低于这个值的格子为不可放置的区域, 为 None 时根据角落颜色的聚类判断"""
+    dark_ratio: float = 0.5
+    """最暗的中性色一类的亮度低于背景亮度的这个倍数时, 为不可放置的区域"""
+    dark_margin: float = 10
+    """最暗的中性色一类的亮度 (Lab 空间, 0~100) 至少比背景低这个值时, 才是不可放置的区域"""
+    neutral_chroma: float = 15
+    """彩度 (Lab 空间) 低于这个值的颜色为中性色, 背景和不可放置的区域一般为中性色"""
+    corner_tolerance: float = 10
+    """角落颜色聚类时, 颜色差 (Lab 空间) 小于这个值的为同一类"""
+    piece_threshold: float = 25
+    """中心与角落, 或者角落与背景的颜色差 (Lab 空间) 大于这个值的格子有棋子"""
+    edge_threshold: float = 1.5
+    """沿着从格子中心出发的射线, 棋子边缘两侧的颜色差 (Lab 空间) 在大部分方向上都大于这个值的格子有棋子"""
+    edge_inner_ratio: float = 0.2
+    """寻找棋子边缘的范围, 到格子中心的最小距离占格子边长的比例"""
+    edge_outer_ratio: float = 0.42
+    """寻找棋子边缘的范围, 到格子中心的最大距离占格子边长的比例, 避开网格线"""
+    edge_angles: int = 32
+    """寻找棋子边缘的射线数量"""
+    edge_quantile: float = 0.25
+    """边缘强度取所有射线的这个分位数, 允许少量方向被连线等遮挡"""
+    color_tolerance: Optional[float] = None
+    """颜色差 (Lab 空间) 小于这个值的棋子为同一种颜色, 为 None 时根据棋子内部的颜色波动估计"""
+    noise_factor: float = 4
+    """自动估计 color_tolerance 时, 棋子内部颜色波动的倍数"""
+    min_color_tolerance: float = 2.5
+    """自动估计的 color_tolerance 的最小值"""
+    center_ratio: float = 0.2
+    """中心采样区域的边长占格子边长的比例"""
+    corner_ratio: float = 0.1
+    """角落采样区域的边长占格子边长的比例"""
+    corner_inset: float = 0.12
+    """角落采样区域距离格子边缘的距离占格子边长的比例, 避开网格线"""
+
+
+def estimate_cells(profile: numpy.ndarray, min_cell: int = 8, window: int = 1,
+                   edge_ratio: float = 0.1, tolerance: float = 0.8) -> int:
+    """
+    根据一维的梯度分布估计格子的数量
+    图片已经裁剪到棋盘的范围, 格子数为 n 时, 格子之间的边界位于 i * length / n,
+    边界上应该有明显的梯度 (网格线或者格子的边缘), 格子的中线 (i + 0.5) * length / n 上一般没有
+    对每个候选的 n, 计算 落在明显梯度上的边界的比例 - 落在明显梯度上的中线的比例:
+        比真实格子数少的候选 (例如 n/3), 边界是真实边界的子集, 得分相同 (n/2 的中线落在真实边界上, 得分更低)
+        比真实格子数多的候选 (例如 2n), 有一半的边界落在格子中间, 得分下降
+    所以取得分不低于最高分 tolerance 倍的最大的 n
+    """
+    length = len(profile)
+    max_cells = length // min_cell
+    if max_cells < 2:
+        raise Exception("图片太小, 无法识别网格")
+
+    # 每个位置附近 window 个像素内的最大梯度, 允许边界有少量偏移
+    padded = numpy.pad(profile, window)
+    local_max = numpy.lib.stride_tricks.sliding_window_view(padded, 2 * window + 1).max(axis=1)
+    strong = local_max >= local_max.max() * edge_ratio
+    if local_max.max() <= 0:
+        raise Exception("无法识别网格, 图片中没有明显的格子边界")
+
+    def strong_ratio(positions: numpy.ndarray) -> float:
+        return float(strong[positions.round().astype(int).clip(0, length - 1)].mean())
+
+    counts = numpy.arange(2, max_cells + 1)
+    ratios = numpy.array([
+        strong_ratio(numpy.arange(1, n) * length / n) - strong_ratio((numpy.arange(n) + 0.5) * length / n)
+        for n in counts
+    ])
+    return int(counts[ratios >= ratios.max() * tolerance].max())
+
+
+def detect_grid(image: numpy.ndarray, rows: Optional[int] = None, cols: Optional[int] = None) -> Grid:
+    """
+    识别网格, image 需要已经裁剪到棋盘的范围
+    指定了 rows/cols 时, 直接按照行数/列数均分
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY).astype(numpy.float32)
+    height, width = gray.shape
+
+    if rows is None:
+        profile_y = numpy.abs(numpy.diff(gray, axis=0)).sum(axis=1)
+        rows = estimate_cells(profile_y)
+    if cols is None:
+        profile_x = numpy.abs(numpy.diff(gray, axis=1)).sum(axis=0)
+        cols = estimate_cells(profile_x)
+
+    return Grid(cell_height=height / rows, cell_width=width / cols, rows=rows, cols=cols)
+
+
+def sample_patches(image: numpy.ndarray, grid: Grid, offset_y: float, offset_x: float, ratio: float) -> numpy.ndarray:
+    """
+    批量采样每个格子中的一个正方形区域
+    offset_y/offset_x 为采样区域的中心相对于格子左上角的位置, 占格子边长的比例
+
+    Returns
+    -------
+    (rows, size_y, cols, size_x, channels) 的像素
+    """
+    size_y = max(1, int(grid.cell_height * ratio))
+    size_x = max(1, int(grid.cell_width * ratio))
+    centers_y = (numpy.arange(grid.rows) + offset_y) * grid.cell_height
+    centers_x = (numpy.arange(grid.cols) + offset_x) * grid.cell_width
+    ys = (centers_y[:, None] + numpy.arange(size_y)[None, :] - size_y / 2).astype(int)
+    xs = (centers_x[:, None] + numpy.arange(size_x)[None, :] - size_x / 2).astype(int)
+    ys = ys.clip(0, image.shape[0] - 1)
+    xs = xs.clip(0, image.shape[1] - 1)
+    return image[ys[:, :, None, None], xs[None, None, :, :]]
+
+
+def sample_cells(image: numpy.ndarray, grid: Grid, offset_y: float, offset_x: float, ratio: float) -> numpy.ndarray:
+    """
+    批量采样每个格子中的一个正方形区域的平均颜色
+
+    Returns
+    -------
+    (rows, cols, channels) 的平均颜色
+    """
+    patches = sample_patches(image, grid, offset_y, offset_x, ratio)
+    return patches.astype(numpy.float32).mean(axis=(1, 3))
+
+
+def edge_strength(lab: numpy.ndarray, grid: Grid, config: RecognitionConfig) -> numpy.ndarray:
+    """
+    每个格子中棋子边缘的强度
+    从格子中心向 edge_angles 个方向发出射线, 每条射线上间隔约 2 像素的两点之间的最大颜色差为该方向的边缘强度,
+    圆形的棋子在所有方向上都有边缘, 即使颜色与背景非常接近; 空位的背景在格子内部颜色均匀, 没有边缘
+
+    Returns
+    -------
+    (rows, cols) 的边缘强度, 为所有方向的边缘强度的 edge_quantile 分位数
+    """
+    cell_size = min(grid.cell_height, grid.cell_width)
+    # 射线上每个像素采样一次
+    radii_count = max(3, int((config.edge_outer_ratio - config.edge_inner_ratio) * cell_size) + 1)
+    radii = numpy.linspace(config.edge_inner_ratio, config.edge_outer_ratio, radii_count)
+    angles = numpy.linspace(0, 2 * numpy.pi, config.edge_angles, endpoint=False)
+
+    # (rows, angles, radii) 和 (cols, angles, radii)
+    offsets_y = numpy.sin(angles)[:, None] * radii[None, :] * grid.cell_height
+    offsets_x = numpy.cos(angles)[:, None] * radii[None, :] * grid.cell_width
+    ys = ((numpy.arange(grid.rows) + 0.5)[:, None, None] * grid.cell_height + offsets_y).round().astype(int)
+    xs = ((numpy.arange(grid.cols) + 0.5)[:, None, None] * grid.cell_width + offsets_x).round().astype(int)
+    ys = ys.clip(0, lab.shape[0] - 1)
+    xs = xs.clip(0, lab.shape[1] - 1)
+
+    # (rows, cols, angles, radii, 3)
+    samples = lab[ys[:, None], xs[None, :]]
+    steps = numpy.linalg.norm(samples[..., 2:, :] - samples[..., :-2, :], axis=-1)
+    return numpy.quantile(steps.max(axis=-1), config.edge_quantile, axis=-1)
+
+
+def to_lab(colors: numpy.ndarray) -> numpy.ndarray:
+    """BGR (0~255) -> Lab"""
+    return cv2.cvtColor((colors / 255).astype(numpy.float32), cv2.COLOR_BGR2Lab)
+
+
+def color_tolerance(lab: numpy.ndarray, grid: Grid, has_piece: numpy.ndarray, config: RecognitionConfig) -> float:
+    """
+    同一种颜色的容差
+    指定了 color_tolerance 时直接使用, 否则根据棋子中心区域内的颜色波动估计:
+    截图经过压缩或者缩放后, 同色棋子之间的差别与棋子内部的波动相当, 而渲染的图片中同色棋子完全相同
+    """
+    if config.color_tolerance is not None:
+        return config.color_tolerance
+
+    patches = sample_patches(lab, grid, 0.5, 0.5, config.center_ratio)
+    # (rows, cols) 的颜色标准差
+    noise = numpy.linalg.norm(patches.std(axis=(1, 3)), axis=-1)
+    return max(config.min_color_tolerance, config.noise_factor * float(numpy.median(noise[has_piece])))
+
+
+def group_colors(colors: numpy.ndarray, tolerance: float) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    按颜色相近程度分组, 每个颜色归入第一个足够接近的组
+
+    Returns
+    -------
+    (每个颜色所在的组, 从 0 开始编号; 每组的代表颜色)
+    """
+    labels = numpy.zeros(len(colors), dtype=int)
+    palette: list[numpy.ndarray] = []
+    for index, color in enumerate(colors):
+        if palette:
+            distances = numpy.linalg.norm(numpy.array(palette) - color, axis=-1)
+            nearest = int(numpy.argmin(distances))
+            if distances[nearest] < tolerance:
+                labels[index] = nearest
+                continue
+        palette.append(color)
+        labels[index] = len(palette) - 1
+    return labels, numpy.array(palette)
+
+
+def classify_background(corner_lab: numpy.ndarray, config: RecognitionConfig) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    根据角落颜色的聚类, 找出不可放置的格子和空位的背景颜色
+    只有至少两类中性色, 并且最暗的一类明显比其余中性色中最多的一类暗时, 最暗的一类才是不可放置的区域;
+    例如深色主题的截图中, 背景本身就很暗, 但是没有更暗的一类, 所以所有格子都可以放置
+
+    Returns
+    -------
+    (不可放置的格子 (rows, cols), 背景颜色 (Lab))
+    """
+    shape = corner_lab.shape[:2]
+    labels, palette = group_colors(corner_lab.reshape(-1, 3), config.corner_tolerance)
+    counts = numpy.bincount(labels, minlength=len(palette))
+    lightness = palette[:, 0]
+    neutral = numpy.linalg.norm(palette[:, 1:], axis=-1) < config.neutral_chroma
+
+    if config.dark_threshold is not None:
+        invalid = corner_lab[..., 0] * 255 / 100 < config.dark_threshold
+    else:
+        invalid = numpy.zeros(shape, dtype=bool)
+        neutral_groups = numpy.flatnonzero(neutral)
+        if len(neutral_groups) >= 2:
+            darkest = neutral_groups[numpy.argmin(lightness[neutral_groups])]
+            others = neutral_groups[neutral_groups != darkest]
+            reference = others[numpy.argmax(counts[others])]
+            if (lightness[darkest] < config.dark_ratio * lightness[reference]
+                    and lightness[reference] - lightness[darkest] >= config.dark_margin):
+                invalid = (labels == darkest).reshape(shape)
+
+    # 背景为可放置的格子中最多的一类, 优先选择中性色
+    placeable_counts = numpy.bincount(labels[~invalid.ravel()], minlength=len(palette))
+    if (placeable_counts * neutral).any():
+        placeable_counts = placeable_counts * neutral
+    return invalid, palette[numpy.argmax(placeable_counts)]
+
+
+def classify_cells(image: numpy.ndarray, grid: Grid, config: Optional[RecognitionConfig] = None) -> numpy.ndarray:
+    """
+    将每个格子分类为 -1 (不可放置), 0 (空位), 或者棋子的颜色编号 (1, 2, 3 ...)
+    颜色编号按照该颜色第一次出现的行优先顺序分配
+    """
+    config = config or RecognitionConfig()
+    lab = to_lab(image)
+    center_lab = sample_cells(lab, grid, 0.5, 0.5, config.center_ratio)
+    corner_offset = config.corner_inset + config.corner_ratio / 2
+    corner_lab = sample_cells(lab, grid, corner_offset, corner_offset, config.corner_ratio)
+
+    board = numpy.zeros((grid.rows, grid.cols), dtype=int)
+    invalid, background = classify_background(corner_lab, config)
+    has_piece = numpy.linalg.norm(center_lab - corner_lab, axis=-1) > config.piece_threshold
+    has_piece |= numpy.linalg.norm(corner_lab - background, axis=-1) > config.piece_threshold
+    has_piece |= edge_strength(lab, grid, config) > config.edge_threshold
+    has_piece &= ~invalid
+    board[invalid] = -1
+    if not has_piece.any():
+        return board
+
+    # 按颜色分组, 编号从 1 开始
+    pieces = numpy.flatnonzero(has_piece)
+    labels, _ = group_colors(center_lab.reshape(-1, 3)[pieces], color_tolerance(lab, grid, has_piece, config))
+    board.flat[pieces] = labels + 1
+    return board
+
+
+def crop_image(image: numpy.ndarray, crop: Optional[tuple[int, int, int, int]]) -> numpy.ndarray:
+    """crop 为 (x, y, width, height)"""
+    if crop is None:
+        return image
+    x, y, width, height = crop
+    return image[y:y + height, x:x + width]
+
+
+def recognize_board(image: numpy.ndarray, rows: Optional[int] = None, cols: Optional[int] = None,
+                    crop: Optional[tuple[int, int, int, int]] = None,
+                    config: Optional[RecognitionConfig] = None) -> numpy.ndarray:
+    """
+    从 BGR 格式的截图中识别出棋盘, 返回与 preset.py 中相同格式的棋盘数组
+    """
+    image = crop_image(image, crop)
+    grid = detect_grid(image, rows, cols)
+    board = classify_cells(image, grid, config)
+    if not (board > 0).any():
+        raise Exception(f"没有识别到棋子, 识别出的网格为 {grid.rows} 行 {grid.cols} 列")
+    return board
+
+
+def recognize_file(path: str, rows: Optional[int] = None, cols: Optional[int] = None,
+                   crop: Optional[tuple[int, int, int, int]] = None,
+                   config: Optional[RecognitionConfig] = None) -> numpy.ndarray:
+    image = cv2.imread(path, cv2.IMREAD_COLOR)
+    if image is None:
+        raise Exception(f"无法读取图片 {path}")
+    return recognize_board(image, rows, cols, crop, config)
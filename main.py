@@ -1,10 +1,19 @@
+import argparse
 from PyQt5.QtWidgets import QApplication
 from app.app import WuwaBoardGameApp
+from solver.client import SolveClient
 
 if __name__ == "__main__":
     from preset import board_6_1
-    
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--solver-url", default=None, help="本地求解服务的地址, 例如 http://127.0.0.1:8765")
+    parser.add_argument("--solver-timeout", type=float, default=30,
+                        help="等待求解服务的秒数, 超时后改为本地求解")
+    args = parser.parse_args()
+    solve_client = SolveClient(args.solver_url, timeout=args.solver_timeout) if args.solver_url else None
+
     app = QApplication([])
-    window = WuwaBoardGameApp(board_6_1)
+    window = WuwaBoardGameApp(board_6_1, solve_client=solve_client)
     window.show()
-    app.exec_()
\ No newline at end of file
+    app.exec_()
@@ -0,0 +1,80 @@
+"""
+批量求解棋盘并导出解的回放
+
+用法
+----
+    python -m render boards.jsonl -o replays/
+    python -m ingest screenshots/ | python -m render --format png -o replays/
+
+输入格式与 python -m solver 相同; 每个棋盘用 BFS 求出最优解的路径, 逐帧导出到 输出目录/棋盘名称.mp4
+(--format png 时为 输出目录/棋盘名称/ 下的图片序列), 每个棋盘输出一行 JSON 结果
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from typing import Optional
+from render.export import export_image_sequence, export_video
+from solver.cli import parse_boards, read_sources
+from solver.solver import SearchBudget, solution_path_bfs
+
+
+def output_name(name: str) -> str:
+    """将棋盘名称转换为可以作为文件名的形式, 例如 boards.jsonl#3 -> boards.jsonl_3"""
+    return re.sub(r"[^\w.-]+", "_", os.path.basename(name)) or "board"
+
+
+def export_solution(name: str, board, output: str, export_format: str, grid_size: int, fps: float,
+                    max_nodes: Optional[int], timeout: Optional[float]) -> dict:
+    result: dict = {"name": name, "steps": None, "solvable": None}
+    try:
+        path = solution_path_bfs(board, SearchBudget(max_nodes=max_nodes, timeout=timeout))
+    except Exception as e:
+        # 超出预算 (SearchBudgetExceeded) 或者棋盘不合法
+        result["error"] = str(e)
+        return result
+
+    result["solvable"] = path is not None
+    if path is None:
+        return result
+
+    result["steps"] = len(path) - 1
+    if export_format == "png":
+        target = os.path.join(output, output_name(name))
+        result["frames"] = export_image_sequence(path, target, grid_size)
+    else:
+        target = os.path.join(output, output_name(name) + ".mp4")
+        result["frames"] = export_video(path, target, grid_size, fps)
+    result["output"] = target
+    return result
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m render", description="批量求解鸣潮-兽痕棋盘并导出解的回放")
+    parser.add_argument("files", nargs="*", help="棋盘文件, 不指定或者为 - 时从标准输入读取")
+    parser.add_argument("-o", "--output", default="replays", help="输出目录")
+    parser.add_argument("-f", "--format", dest="export_format", choices=["mp4", "png"], default="mp4")
+    parser.add_argument("--grid-size", type=int, default=50, help="每个格子的像素数")
+    parser.add_argument("--fps", type=float, default=2, help="视频每秒的帧数")
+    parser.add_argument("--max-nodes", type=int, default=None, help="每个棋盘最多展开的节点数")
+    parser.add_argument("--timeout", type=float, default=None, help="每个棋盘最多求解的秒数")
+    args = parser.parse_args(argv)
+    os.makedirs(args.output, exist_ok=True)
+
+    failed = False
+    for source, text, error in read_sources(args.files, sys.stdin):
+        if text is None:
+            failed = True
+            print(json.dumps({"name": source, "error": error}, ensure_ascii=False), flush=True)
+            continue
+        for name, board, error in parse_boards(text, source):
+            if board is None:
+                result = {"name": name, "error": error}
+            else:
+                result = export_solution(name, board, args.output, args.export_format, args.grid_size,
+                                         args.fps, args.max_nodes, args.timeout)
+            failed = failed or "error" in result
+            print(json.dumps(result, ensure_ascii=False), flush=True)
+    return 1 if failed else 0
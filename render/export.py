@@ -0,0 +1,92 @@
+"""
+将一系列棋盘 (例如一条解的路径) 逐帧导出为图片序列、视频或 GIF
+图片序列和视频的帧在生成后立即写出, 不会把所有帧保存在内存中;
+GIF 是例外, Pillow 会在写文件之前收集所有帧 (量化后每像素 1 字节), 内存占用与帧数成正比
+"""
+
+import os
+from typing import Iterable, Iterator
+import cv2
+import numpy
+from PIL import Image
+from render.renderer import get_renderer
+from structure.board import Board
+
+
+def iter_frames(boards: Iterable[Board], grid_size: int = 50) -> Iterator[numpy.ndarray]:
+    renderer = get_renderer(grid_size)
+    for board in boards:
+        yield renderer.render(board)
+
+
+def export_image_sequence(boards: Iterable[Board], directory: str,
+                          grid_size: int = 50, pattern: str = "{:04d}.png") -> int:
+    """
+    逐帧写出到 directory 下, 文件名为 pattern.format(帧序号)
+
+    Returns
+    -------
+    写出的帧数
+    """
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    for count, frame in enumerate(iter_frames(boards, grid_size), start=1):
+        cv2.imwrite(os.path.join(directory, pattern.format(count - 1)), frame)
+    return count
+
+
+def export_video(boards: Iterable[Board], path: str,
+                 grid_size: int = 50, fps: float = 2, fourcc: str = "mp4v") -> int:
+    """
+    逐帧写出到视频文件 (默认 MP4)
+
+    Returns
+    -------
+    写出的帧数
+    """
+    writer = None
+    count = 0
+    try:
+        for count, frame in enumerate(iter_frames(boards, grid_size), start=1):
+            if writer is None:
+                height, width = frame.shape[:2]
+                writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height))
+                if not writer.isOpened():
+                    raise Exception(f"无法写入视频文件 {path}")
+            writer.write(frame)
+    finally:
+        if writer is not None:
+            writer.release()
+    return count
+
+
+def export_gif(boards: Iterable[Board], path: str,
+               grid_size: int = 50, duration: int = 500, loop: int = 0) -> int:
+    """
+    导出 GIF 动画, duration 为每帧的毫秒数
+
+    Pillow 没有逐帧写 GIF 的接口, 会先收集所有帧再写文件, 这里每帧生成后立即量化为调色板图片 (每像素 1 字节),
+    所有帧仍然会同时保存在内存中, 长路径请优先使用 export_video 或 export_image_sequence
+
+    Returns
+    -------
+    写出的帧数
+    """
+    frames = (
+        Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)).quantize()
+        for frame in iter_frames(boards, grid_size)
+    )
+    first = next(frames, None)
+    if first is None:
+        return 0
+
+    count = 1
+
+    def counted():
+        nonlocal count
+        for frame in frames:
+            count += 1
+            yield frame
+
+    first.save(path, save_all=True, append_images=counted(), duration=duration, loop=loop)
+    return count
@@ -0,0 +1,225 @@
+"""
+棋盘渲染
+静态背景按 grid_mask 缓存, 每个有棋子的格子按 (颜色, 是否活跃, 四个方向的连线) 合成一张完整的格子贴图并缓存,
+通过 numpy 一次性贴到所有格子上
+贴图四周留有 margin, grid_size 较小时棋子和连线会超出自身的格子, 此时按照原来的绘制顺序逐个贴图
+"""
+
+from random import shuffle
+from typing import TYPE_CHECKING
+import cv2
+import numpy
+from PIL import ImageColor
+
+if TYPE_CHECKING:
+    from structure.board import Board
+
+COLORS = [ImageColor.getrgb(code) for _, code in ImageColor.colormap.items()]
+shuffle(COLORS)
+
+LINE_COLOR = (80, 80, 80)
+GRID_COLOR = (200, 200, 200)
+DIRECTIONS = ((-1, 0), (0, 1), (1, 0), (0, -1))
+"""上、右、下、左四个方向"""
+
+
+class BoardRenderer:
+    def __init__(self, grid_size: int = 50) -> None:
+        self.grid_size = grid_size
+        self.margin = grid_size + 4
+        """贴图四周的留白, 足够容纳到相邻格子中心的连线和棋子的外框"""
+        self.backgrounds: dict[tuple, numpy.ndarray] = {}
+        """(shape, grid_mask bytes) -> 背景图片 的缓存"""
+        self.sprites: dict[tuple[int, bool], tuple[numpy.ndarray, numpy.ndarray]] = {}
+        """(color, active) -> (贴图, 贴图遮罩) 的缓存"""
+        self.cell_tiles: dict[tuple[int, bool, int], numpy.ndarray] = {}
+        """(color, active, links) -> 合成好的格子贴图 的缓存, links 的第 i 位代表 DIRECTIONS[i] 方向有连线"""
+        self.link_masks = self.build_link_masks()
+        """上、右、下、左 四个方向的连线遮罩, 带有 margin"""
+        self.fits_in_cell = self.check_fits_in_cell()
+        """棋子和连线是否都可以在各自的格子内绘制, 为 True 时使用批量贴图"""
+
+    def build_background(self, grid_mask: numpy.ndarray) -> numpy.ndarray:
+        """
+        grid_mask 为 False 的区域为黑色, True 的地方为白色并且带有网格线
+        """
+        g = self.grid_size
+        pixel_mask = numpy.repeat(numpy.repeat(grid_mask, g, axis=0), g, axis=1)
+        img = numpy.zeros(pixel_mask.shape + (3,), dtype=numpy.uint8)
+        img[pixel_mask] = 255
+
+        # 每个可放置格子的上边和左边绘制网格线
+        edge = numpy.zeros((g, g), dtype=bool)
+        edge[0, :] = True
+        edge[:, 0] = True
+        edge_mask = pixel_mask & numpy.tile(edge, grid_mask.shape)
+        img[edge_mask] = GRID_COLOR
+        return img
+
+    def background(self, grid_mask: numpy.ndarray) -> numpy.ndarray:
+        key = (grid_mask.shape, grid_mask.tobytes())
+        img = self.backgrounds.get(key)
+        if img is None:
+            img = self.build_background(grid_mask)
+            self.backgrounds[key] = img
+        return img
+
+    def build_link_masks(self) -> list[numpy.ndarray]:
+        g, m = self.grid_size, self.margin
+        c = m + g // 2
+        masks = []
+        for dx, dy in DIRECTIONS:
+            mask = numpy.zeros((g + 2 * m, g + 2 * m), dtype=numpy.uint8)
+            end = (c + dy * g, c + dx * g)
+            cv2.line(mask, (c, c), end, 1, 4)
+            masks.append(mask.astype(bool))
+        return masks
+
+    def sprite(self, color: int, active: bool) -> tuple[numpy.ndarray, numpy.ndarray]:
+        """带有 margin 的棋子贴图和贴图遮罩"""
+        key = (color, active)
+        cached = self.sprites.get(key)
+        if cached is not None:
+            return cached
+
+        g, m = self.grid_size, self.margin
+        center = (m + g // 2, m + g // 2)
+        radius = g // 3
+        tile = numpy.zeros((g + 2 * m, g + 2 * m, 3), dtype=numpy.uint8)
+        alpha = numpy.zeros((g + 2 * m, g + 2 * m), dtype=numpy.uint8)
+        cv2.circle(tile, center, radius, COLORS[color % len(COLORS)], -1)
+        cv2.circle(alpha, center, radius, 1, -1)
+        # 如果区块是活跃的, 绘制外框
+        if active:
+            cv2.circle(tile, center, radius + 2, (0, 0, 0), 2)
+            cv2.circle(alpha, center, radius + 2, 1, 2)
+
+        cached = (tile, alpha.astype(bool)[..., None])
+        self.sprites[key] = cached
+        return cached
+
+    def crop_cell(self, sprite: numpy.ndarray) -> numpy.ndarray:
+        """去掉贴图的 margin, 只保留格子自身的部分"""
+        g, m = self.grid_size, self.margin
+        return sprite[m:m + g, m:m + g]
+
+    def check_fits_in_cell(self) -> bool:
+        """
+        检查批量贴图的结果是否与直接绘制一致:
+            1. 棋子 (包括外框) 不超出自身的格子
+            2. 两个相邻棋子之间的连线, 只落在这两个格子中, 并且两端各自裁剪之后的并集与完整的连线相同
+        """
+        g, m = self.grid_size, self.margin
+        _, alpha = self.sprite(0, True)
+        if alpha.sum() != self.crop_cell(alpha).sum():
+            return False
+
+        for direction, (dx, dy) in enumerate(DIRECTIONS):
+            mask = self.link_masks[direction]
+            opposite = self.crop_cell(self.link_masks[(direction + 2) % 4])
+            # 相邻格子在贴图中的位置
+            nx, ny = m + dx * g, m + dy * g
+            neighbor = mask[nx:nx + g, ny:ny + g]
+            if mask.sum() != self.crop_cell(mask).sum() + neighbor.sum():
+                return False
+            # 落在相邻格子中的部分, 需要被相邻格子反方向的连线覆盖
+            if (neighbor & ~opposite).any():
+                return False
+        return True
+
+    def render(self, board: "Board") -> numpy.ndarray:
+        """
+        生成一个 height 为 (长*grid_size), width 为 (宽*grid_size) 的图片
+        有棋子的地方, 用圆圈代表棋子, 并且圆圈的颜色代表棋子的颜色, 同一区块的棋子之间用灰色线段连接
+        """
+        if not self.fits_in_cell:
+            return self.render_with_overlap(board)
+
+        g = self.grid_size
+        height, width = board.shape
+        img = self.background(board.grid_mask).copy()
+        # (H, W, g, g, 3) 的视图, 对其赋值会直接写入 img
+        cells = img.reshape(height, g, width, g, 3).swapaxes(1, 2)
+
+        block_ids = numpy.full(board.shape, fill_value=-1, dtype=int)
+        sprite_ids = numpy.full(board.shape, fill_value=-1, dtype=int)
+        sprite_keys: dict[tuple[int, bool], int] = {}
+        for index, block in enumerate(board.blocks):
+            rows, cols = zip(*block.pieces)
+            block_ids[rows, cols] = index
+            key = (block.color, block.active)
+            sprite_ids[rows, cols] = sprite_keys.setdefault(key, len(sprite_keys))
+        if not sprite_keys:
+            return img
+
+        # 每个格子四个方向的连线, 只在同一区块的相邻棋子之间
+        occupied = block_ids >= 0
+        same_v = occupied[1:, :] & (block_ids[1:, :] == block_ids[:-1, :])
+        same_h = occupied[:, 1:] & (block_ids[:, 1:] == block_ids[:, :-1])
+        links = numpy.zeros(board.shape, dtype=int)
+        links[1:, :] |= same_v          # 上
+        links[:, :-1] |= same_h << 1    # 右
+        links[:-1, :] |= same_v << 2    # 下
+        links[:, 1:] |= same_h << 3     # 左
+
+        # 相同 (颜色, 是否活跃, 连线) 的格子使用同一张贴图, 每个格子只写入一次
+        rows, cols = numpy.nonzero(occupied)
+        tile_keys, inverse = numpy.unique(sprite_ids[rows, cols] * 16 + links[rows, cols], return_inverse=True)
+        sprite_list = list(sprite_keys)
+        tiles = numpy.stack([self.cell_tile(*sprite_list[key // 16], key % 16) for key in tile_keys.tolist()])
+        cells[rows, cols] = tiles[inverse]
+        return img
+
+    def cell_tile(self, color: int, active: bool, links: int) -> numpy.ndarray:
+        """
+        有棋子的格子的完整贴图: 可放置格子的背景, 连线, 棋子
+        棋子只会出现在可放置的格子中, 而所有可放置格子的背景都相同, 所以贴图可以直接覆盖整个格子
+        """
+        key = (color, active, links)
+        tile = self.cell_tiles.get(key)
+        if tile is None:
+            tile = self.build_background(numpy.ones((1, 1), dtype=bool))
+            for direction, link_mask in enumerate(self.link_masks):
+                if links >> direction & 1:
+                    tile[self.crop_cell(link_mask)] = LINE_COLOR
+            sprite, alpha = self.sprite(color, active)
+            numpy.copyto(tile, self.crop_cell(sprite), where=self.crop_cell(alpha))
+            self.cell_tiles[key] = tile
+        return tile
+
+    def render_with_overlap(self, board: "Board") -> numpy.ndarray:
+        """
+        棋子或者连线会超出自身格子时的渲染方式 (grid_size 较小)
+        相邻格子的贴图会相互覆盖, 所以按照 先连线, 再按区块顺序绘制棋子 的顺序逐个贴图
+        """
+        g, m = self.grid_size, self.margin
+        size = g + 2 * m
+        canvas = numpy.pad(self.background(board.grid_mask), ((m, m), (m, m), (0, 0)))
+
+        # 格子 (x, y) 的贴图在 canvas 中的左上角为 (x * g, y * g)
+        for block in board.blocks:
+            pieces = set(block.pieces)
+            for x, y in block.pieces:
+                window = canvas[x * g:x * g + size, y * g:y * g + size]
+                for (dx, dy), link_mask in zip(DIRECTIONS, self.link_masks):
+                    if (x + dx, y + dy) in pieces:
+                        window[link_mask] = LINE_COLOR
+
+        for block in board.blocks:
+            tile, alpha = self.sprite(block.color, block.active)
+            for x, y in block.pieces:
+                window = canvas[x * g:x * g + size, y * g:y * g + size]
+                numpy.copyto(window, tile, where=alpha)
+        return canvas[m:-m, m:-m].copy()
+
+
+DEFAULT_RENDERERS: dict[int, BoardRenderer] = {}
+
+
+def get_renderer(grid_size: int = 50) -> BoardRenderer:
+    """按 grid_size 共享渲染器, 使背景和贴图缓存在多次渲染之间复用"""
+    renderer = DEFAULT_RENDERERS.get(grid_size)
+    if renderer is None:
+        renderer = BoardRenderer(grid_size)
+        DEFAULT_RENDERERS[grid_size] = renderer
+    return renderer
@@ -0,0 +1,168 @@
+"""
+无界面的命令行求解入口
+
+用法
+----
+    python -m solver board.txt boards.jsonl
+    cat board.txt | python -m solver --algorithm dfs --timeout 10
+
+棋盘文件支持两种格式:
+    1. 纯文本, 每行一排格子, 用空格或逗号分隔, 多个棋盘之间用空行分隔
+    2. JSON, 可以是单个棋盘 (二维数组), 棋盘的列表, 或者每行一个棋盘的 JSON Lines;
+       棋盘也可以写成 {"name": ..., "board": [[...]]} 的形式
+
+每个棋盘输出一行 JSON 结果
+"""
+
+import argparse
+import json
+import sys
+from time import perf_counter
+from typing import Callable, Iterator, Optional, TextIO
+import numpy
+from structure.board import Board
+from solver.solver import SearchBudget, minimum_steps_bfs, minimum_steps_bidirectional, minimum_steps_dfs
+
+ALGORITHMS: dict[str, Callable] = {
+    "bfs": minimum_steps_bfs,
+    "bidirectional": minimum_steps_bidirectional,
+    "dfs": lambda board, budget: minimum_steps_dfs(board, budget, save_images=False),
+}
+
+
+def parse_text_boards(text: str) -> Iterator[list[list[str]]]:
+    """按空行切分纯文本棋盘, 每个棋盘为按行切分好的字符串, 在 load_board 中再转换为数字"""
+    rows: list[list[str]] = []
+    for line in text.splitlines() + [""]:
+        line = line.strip()
+        if line:
+            rows.append(line.replace(",", " ").split())
+        elif rows:
+            yield rows
+            rows = []
+
+
+def is_board_list(item) -> bool:
+    """JSON 中的 item 是否为棋盘的列表 (而不是单个棋盘), 各个棋盘的大小可以不同"""
+    if not isinstance(item, list) or not item:
+        return False
+    first = item[0]
+    return isinstance(first, dict) or (isinstance(first, list) and bool(first) and isinstance(first[0], list))
+
+
+def expand_json(item) -> Iterator:
+    """将 JSON 中的棋盘列表逐个展开"""
+    if is_board_list(item):
+        for entry in item:
+            yield from expand_json(entry)
+    else:
+        yield item
+
+
+def load_board(name: str, raw) -> tuple[str, Optional[numpy.ndarray], Optional[str]]:
+    """将一个解析出来的棋盘转换为数组, 失败时返回错误信息而不是抛出异常"""
+    try:
+        if isinstance(raw, dict):
+            name = str(raw.get("name", name))
+            raw = raw["board"]
+        board = numpy.array(raw, dtype=int)
+        if board.ndim != 2:
+            raise Exception("棋盘维度必须为2")
+        return name, board, None
+    except Exception as e:
+        return name, None, f"无法解析棋盘: {e!r}"
+
+
+def parse_boards(text: str, source: str) -> Iterator[tuple[str, Optional[numpy.ndarray], Optional[str]]]:
+    """
+    从文本中解析出所有的棋盘, 单个棋盘解析失败时不影响其他棋盘
+
+    Returns
+    -------
+    (名称, 棋盘, 错误信息) 的迭代器, 名称默认为 来源#序号 的形式, 解析失败时棋盘为 None
+    """
+    if not text.lstrip().startswith(("[", "{")):
+        for index, rows in enumerate(parse_text_boards(text)):
+            yield load_board(f"{source}#{index}", rows)
+        return
+
+    try:
+        json.loads(text)
+        documents = [text]
+    except json.JSONDecodeError:
+        # JSON Lines, 每行一个棋盘
+        documents = [line for line in text.splitlines() if line.strip()]
+
+    index = 0
+    for document in documents:
+        try:
+            entries = list(expand_json(json.loads(document)))
+        except json.JSONDecodeError as e:
+            yield f"{source}#{index}", None, f"无法解析 JSON: {e}"
+            index += 1
+            continue
+        for entry in entries:
+            yield load_board(f"{source}#{index}", entry)
+            index += 1
+
+
+def solve(name: str, board: numpy.ndarray, algorithm: str,
+          max_nodes: Optional[int], timeout: Optional[float]) -> dict:
+    budget = SearchBudget(max_nodes=max_nodes, timeout=timeout)
+    result = {"name": name, "algorithm": algorithm, "steps": None, "solvable": None}
+    try:
+        steps, can_complete = ALGORITHMS[algorithm](board, budget)
+        result["solvable"] = can_complete
+        if can_complete:
+            result["steps"] = steps
+    except Exception as e:
+        # 超出预算 (SearchBudgetExceeded) 或者棋盘不合法
+        result["error"] = str(e)
+    result["nodes"] = budget.nodes
+    result["elapsed"] = round(perf_counter() - budget.started, 6)
+    return result
+
+
+def read_sources(paths: list[str], stdin: TextIO) -> Iterator[tuple[str, Optional[str], Optional[str]]]:
+    """
+    Returns
+    -------
+    (来源, 文本, 错误信息) 的迭代器, 无法读取的文件文本为 None
+    """
+    if not paths:
+        paths = ["-"]
+    for path in paths:
+        if path == "-":
+            yield "<stdin>", stdin.read(), None
+            continue
+        try:
+            with open(path, encoding="utf-8") as f:
+                yield path, f.read(), None
+        except (OSError, UnicodeDecodeError) as e:
+            yield path, None, f"无法读取文件: {e}"
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m solver", description="鸣潮-兽痕 棋盘求解")
+    parser.add_argument("files", nargs="*", help="棋盘文件, 不指定或者为 - 时从标准输入读取")
+    parser.add_argument("-a", "--algorithm", choices=sorted(ALGORITHMS), default="bfs")
+    parser.add_argument("--max-nodes", type=int, default=None, help="每个棋盘最多展开的节点数")
+    parser.add_argument("--timeout", type=float, default=None, help="每个棋盘最多求解的秒数")
+    parser.add_argument("--verify-move-cache", action="store_true", help="调试用, 将缓存的移动列表与重新计算的结果进行对比")
+    args = parser.parse_args(argv)
+    Board.verify_move_cache = args.verify_move_cache
+
+    failed = False
+    for source, text, error in read_sources(args.files, sys.stdin):
+        if text is None:
+            failed = True
+            print(json.dumps({"name": source, "error": error}, ensure_ascii=False), flush=True)
+            continue
+        for name, board, error in parse_boards(text, source):
+            if board is None:
+                result = {"name": name, "error": error}
+            else:
+                result = solve(name, board, args.algorithm, args.max_nodes, args.timeout)
+            failed = failed or "error" in result
+            print(json.dumps(result, ensure_ascii=False), flush=True)
+    return 1 if failed else 0
@@ -0,0 +1,74 @@
+"""
+本地求解服务 (solver.server) 的客户端
+"""
+
+import json
+from typing import Optional
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+import numpy
+from solver.server import DEFAULT_HOST, DEFAULT_PORT
+from solver.solver import UNSOLVABLE_STEPS
+
+
+class SolveServiceError(Exception):
+    """求解服务返回了错误, 例如超出预算或者棋盘不合法"""
+
+
+class SolveClient:
+    def __init__(self, url: str = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", timeout: Optional[float] = None) -> None:
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        """等待服务响应的秒数, None 代表一直等待"""
+
+    def request(self, path: str, payload: Optional[dict] = None) -> dict:
+        """
+        连接失败或者超时时抛出 OSError, 服务返回错误或者响应不是求解服务的 JSON 时抛出 SolveServiceError
+        (例如端口被其他服务占用)
+        """
+        data = None if payload is None else json.dumps(payload).encode("utf-8")
+        request = Request(self.url + path, data=data, headers={"Content-Type": "application/json"})
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                result = self.decode(response.read())
+        except HTTPError as e:
+            try:
+                message = self.decode(e.read()).get("error", str(e))
+            except SolveServiceError:
+                message = str(e)
+            raise SolveServiceError(message) from e
+        return result
+
+    @staticmethod
+    def decode(body: bytes) -> dict:
+        try:
+            result = json.loads(body)
+        except ValueError as e:
+            raise SolveServiceError(f"求解服务返回的不是 JSON: {body[:80]!r}") from e
+        if not isinstance(result, dict):
+            raise SolveServiceError(f"求解服务返回的 JSON 不是对象: {body[:80]!r}")
+        return result
+
+    def solve(self, board: numpy.ndarray, algorithm: str = "bfs",
+              max_nodes: Optional[int] = None, timeout: Optional[float] = None) -> dict:
+        return self.request("/solve", {
+            "board": numpy.asarray(board).tolist(),
+            "algorithm": algorithm,
+            "max_nodes": max_nodes,
+            "timeout": timeout,
+        })
+
+    def minimum_steps(self, board: numpy.ndarray, algorithm: str = "bfs") -> tuple[int, bool]:
+        """
+        与 minimum_steps_bfs 相同的返回值 (最佳步数, 是否有解), 无解时最佳步数为 UNSOLVABLE_STEPS
+        连接失败或者超时时抛出 OSError, 服务返回错误时抛出 SolveServiceError
+        """
+        result = self.solve(board, algorithm)
+        if "error" in result:
+            raise SolveServiceError(result["error"])
+        if not result["solvable"]:
+            return UNSOLVABLE_STEPS, False
+        return result["steps"], True
+
+    def metrics(self) -> dict:
+        return self.request("/metrics")
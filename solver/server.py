@@ -0,0 +1,190 @@
+"""
+本地求解服务
+
+多个工具 (界面、批处理脚本等) 共享同一个求解进程池和结果缓存:
+    1. 相同的棋盘已经求解过时, 直接返回缓存的结果
+    2. 相同的棋盘正在求解时, 新的请求等待同一个计算结果, 不会重复计算
+    3. GET /metrics 返回排队数量、延迟和缓存命中等统计
+
+用法
+----
+    python -m solver.server --port 8765 --workers 4
+
+    POST /solve  {"board": [[...]], "algorithm": "bfs", "max_nodes": null, "timeout": null}
+    GET  /metrics
+"""
+
+import argparse
+import json
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+from typing import Optional
+import numpy
+from solver.cli import ALGORITHMS, solve
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class SolveService:
+    def __init__(self, workers: Optional[int] = None, cache_size: int = 4096, latency_window: int = 1000) -> None:
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.lock = threading.Lock()
+        self.cache: OrderedDict[tuple, dict] = OrderedDict()
+        """(algorithm, shape, 棋盘 bytes) -> 求解结果, 按最近使用淘汰"""
+        self.cache_size = cache_size
+        self.inflight: dict[tuple, Future] = {}
+        """正在求解的请求, 相同的请求共享同一个 Future"""
+        self.latencies: deque[float] = deque(maxlen=latency_window)
+        self.counters = {"requests": 0, "cache_hits": 0, "coalesced": 0, "computed": 0, "errors": 0}
+
+    @staticmethod
+    def board_key(board: numpy.ndarray, algorithm: str) -> tuple:
+        return (algorithm, board.shape, board.tobytes())
+
+    def solve(self, board: numpy.ndarray, algorithm: str = "bfs",
+              max_nodes: Optional[int] = None, timeout: Optional[float] = None) -> dict:
+        """
+        求解棋盘, 可以在多个线程中同时调用
+
+        Returns
+        -------
+        与 python -m solver 输出相同格式的结果, 额外的 source 字段代表结果来源: cache, coalesced 或 computed
+        """
+        if algorithm not in ALGORITHMS:
+            raise Exception(f"未知的算法 {algorithm}")
+
+        started = perf_counter()
+        board = numpy.ascontiguousarray(board, dtype=int)
+        key = self.board_key(board, algorithm)
+        # 超出预算的结果不会被缓存, 所以只有预算相同的请求可以合并
+        inflight_key = key + (max_nodes, timeout)
+
+        submitted = False
+        with self.lock:
+            self.counters["requests"] += 1
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache.move_to_end(key)
+                self.counters["cache_hits"] += 1
+                source = "cache"
+            else:
+                future = self.inflight.get(inflight_key)
+                if future is not None:
+                    self.counters["coalesced"] += 1
+                    source = "coalesced"
+                else:
+                    future = self.executor.submit(solve, "", board, algorithm, max_nodes, timeout)
+                    self.inflight[inflight_key] = future
+                    self.counters["computed"] += 1
+                    source = "computed"
+                    submitted = True
+
+        # 已经完成的 Future 会在 add_done_callback 中直接调用 on_done, on_done 需要获取 self.lock,
+        # 所以必须在释放锁之后再注册
+        if submitted:
+            future.add_done_callback(lambda f: self.on_done(key, inflight_key, f))
+
+        result = dict(cached if cached is not None else future.result())
+        result["source"] = source
+        with self.lock:
+            self.latencies.append(perf_counter() - started)
+        return result
+
+    def on_done(self, key: tuple, inflight_key: tuple, future: Future):
+        with self.lock:
+            self.inflight.pop(inflight_key, None)
+            if future.cancelled() or future.exception() is not None or "error" in future.result():
+                self.counters["errors"] += 1
+                return
+            self.cache[key] = future.result()
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def metrics(self) -> dict:
+        with self.lock:
+            latencies = sorted(self.latencies)
+            metrics: dict = dict(self.counters)
+            metrics["queue_depth"] = len(self.inflight)
+            metrics["cache_entries"] = len(self.cache)
+
+        if latencies:
+            metrics["latency"] = {
+                "count": len(latencies),
+                "mean": sum(latencies) / len(latencies),
+                "p50": latencies[len(latencies) // 2],
+                "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                "max": latencies[-1],
+            }
+        return metrics
+
+    def shutdown(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+class SolveRequestHandler(BaseHTTPRequestHandler):
+    service: SolveService
+
+    def send_json(self, status: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self.send_json(200, self.service.metrics())
+        else:
+            self.send_json(404, {"error": f"未知的路径 {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/solve":
+            self.send_json(404, {"error": f"未知的路径 {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length))
+            board = numpy.array(request["board"], dtype=int)
+            result = self.service.solve(board, request.get("algorithm", "bfs"),
+                                        request.get("max_nodes"), request.get("timeout"))
+        except Exception as e:
+            self.send_json(400, {"error": str(e)})
+            return
+
+        result["name"] = request.get("name", "")
+        self.send_json(200, result)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+          workers: Optional[int] = None, cache_size: int = 4096):
+    service = SolveService(workers=workers, cache_size=cache_size)
+    handler = type("BoundSolveRequestHandler", (SolveRequestHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"求解服务已启动: http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m solver.server", description="鸣潮-兽痕 本地求解服务")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=None, help="求解进程数, 默认为 CPU 核数")
+    parser.add_argument("--cache-size", type=int, default=4096, help="最多缓存的结果数量")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.cache_size)
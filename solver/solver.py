@@ -3,14 +3,41 @@ Brute force 寻找棋盘的最优解（最短步数）
 """
 
 from collections import deque
+from time import perf_counter
 from typing import Optional
-import cv2
 import numpy
 from structure.board import Board
 from structure.state import State
 
+UNSOLVABLE_STEPS = 99999
+"""无解时返回的最佳步数"""
 
-def minimum_steps_bfs(starting_board: numpy.ndarray):
+
+class SearchBudgetExceeded(Exception):
+    """搜索超出了给定的节点数或时间预算"""
+
+
+class SearchBudget:
+    """
+    搜索预算, 每展开一个节点调用一次 consume
+    max_nodes 为最多展开的节点数, timeout 为最多运行的秒数, None 代表不限制
+    """
+
+    def __init__(self, max_nodes: Optional[int] = None, timeout: Optional[float] = None) -> None:
+        self.max_nodes = max_nodes
+        self.timeout = timeout
+        self.nodes: int = 0
+        self.started: float = perf_counter()
+
+    def consume(self):
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise SearchBudgetExceeded(f"超出节点数预算 {self.max_nodes}")
+        if self.timeout is not None and perf_counter() - self.started > self.timeout:
+            raise SearchBudgetExceeded(f"超出时间预算 {self.timeout}s")
+
+
+def minimum_steps_bfs(starting_board: numpy.ndarray, budget: Optional[SearchBudget] = None):
     """BFS寻找最优解"""
     initial_board = Board.build_from_array(starting_board)
     if initial_board.is_complete():
@@ -19,7 +46,7 @@ def minimum_steps_bfs(starting_board: numpy.ndarray):
     queue: deque[tuple[Board, int]] = deque()
     queue.append((initial_board, 0))
 
-    min_steps: int = 99999      # 最佳步数
+    min_steps: int = UNSOLVABLE_STEPS   # 最佳步数
     can_complete: bool = False  # 是否有解
 
     while True:
@@ -30,6 +57,9 @@ def minimum_steps_bfs(starting_board: numpy.ndarray):
         if steps >= min_steps:
             continue
 
+        if budget is not None:
+            budget.consume()
+
         # 获取所有合法的操作
         actions = current_board.valid_actions()
         for block, shift in actions:
@@ -47,8 +77,94 @@ def minimum_steps_bfs(starting_board: numpy.ndarray):
     return min_steps, can_complete
 
 
-def minimum_steps_dfs(starting_board: numpy.ndarray):
-    min_steps: int = 99999
+def minimum_steps_bidirectional(starting_board: numpy.ndarray, budget: Optional[SearchBudget] = None):
+    """
+    双向搜索寻找最优解
+    正向按层展开棋盘, 反向一侧为所有 "再走一步即可结束" 的局面 (Board.is_goal_adjacent),
+    正向的某一层第一次与反向一侧相遇时立即停止, 不需要再生成最后一层的所有子节点
+    同时对已经出现过的局面去重, 无解的棋盘也可以在有限的时间内结束
+    """
+    initial_board = Board.build_from_array(starting_board)
+    if initial_board.is_complete():
+        return 0, True
+    if initial_board.is_goal_adjacent():
+        return 1, True
+
+    # 每一层的所有局面都不是 goal adjacent, 所以下一层不会有结束状态, 只需要检查下一层是否 goal adjacent
+    seen = {initial_board.state_key()}
+    frontier = [initial_board]
+    depth = 0
+    while frontier:
+        next_frontier = []
+        for board in frontier:
+            if budget is not None:
+                budget.consume()
+
+            for block, shift in board.valid_actions():
+                child = board.take_action(block, shift)
+                key = child.state_key()
+                if key in seen:
+                    continue
+                seen.add(key)
+
+                if child.is_goal_adjacent():
+                    return depth + 2, True
+                next_frontier.append(child)
+
+        frontier = next_frontier
+        depth += 1
+    return UNSOLVABLE_STEPS, False
+
+
+def solution_path_bfs(starting_board: numpy.ndarray,
+                      budget: Optional[SearchBudget] = None) -> Optional[list[Board]]:
+    """
+    BFS寻找最优解, 并返回从初始局面到结束局面的所有棋盘, 用于回放
+    无解时返回 None
+    """
+    initial_board = Board.build_from_array(starting_board)
+    root = State(parent=None, board=initial_board, depth=0, children=[])
+    if initial_board.is_complete():
+        return [initial_board]
+
+    queue: deque[State] = deque([root])
+    best_node: Optional[State] = None
+
+    while queue:
+        cur = queue.popleft()
+        if budget is not None:
+            budget.consume()
+
+        for block, shift in cur.board.valid_actions():
+            child = State(parent=cur, board=cur.board.take_action(block, shift),
+                          depth=cur.depth + 1, children=[])
+            # 按层展开, 第一个完成的局面就是最优解
+            if child.board.is_complete():
+                best_node = child
+                break
+            queue.append(child)
+        if best_node is not None:
+            break
+
+    if best_node is None:
+        return None
+
+    path: list[Board] = []
+    node: Optional[State] = best_node
+    while node is not None:
+        path.append(node.board)
+        node = node.parent
+    path.reverse()
+    return path
+
+
+def minimum_steps_dfs(starting_board: numpy.ndarray, budget: Optional[SearchBudget] = None,
+                      save_images: bool = True):
+    """
+    DFS寻找最优解
+    save_images 为 True 时, 将最优解路径上的每一步保存为 {步数}.png, 用于调试
+    """
+    min_steps: int = UNSOLVABLE_STEPS
     can_complete = False    # 是否有解
     best_node: Optional[State] = None
     initial_board = Board.build_from_array(starting_board)
@@ -62,6 +178,8 @@ def minimum_steps_dfs(starting_board: numpy.ndarray):
             break
 
         cur.visited = True
+        if budget is not None:
+            budget.consume()
 
         # 如果当前探索的层数已经超出了最佳层数，则直接返回上一级
         depth = cur.depth
@@ -106,7 +224,8 @@ def minimum_steps_dfs(starting_board: numpy.ndarray):
         continue
 
     # Debug
-    if best_node is not None:
+    if save_images and best_node is not None:
+        import cv2
         cur = best_node
         index = min_steps
         while True:
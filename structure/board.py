@@ -1,24 +1,45 @@
 from concurrent.futures import ThreadPoolExecutor
-from random import shuffle
 from typing import Optional, Self
-import cv2
 import numpy
 from collections import deque
 from structure.block import Block
 from structure.data_type import Point
-from PIL import ImageColor
 
-COLORS = [ImageColor.getrgb(code) for _, code in ImageColor.colormap.items()]
-shuffle(COLORS)
+NEIGHBOR_OFFSETS: frozenset[Point] = frozenset(((-1, 0), (0, 1), (1, 0), (0, -1)))
+"""上、右、下、左四个方向"""
+
+FOOTPRINT_OFFSETS: dict[tuple[Point, ...], frozenset[Point]] = {}
+"""区块的形状 -> Board.footprint_offsets 的缓存, 形状与区块的位置和棋子顺序无关, 缓存的大小只与出现过的形状数量有关"""
 
 class Board:
-    def __init__(self, blocks: list[Block], grid_mask: numpy.ndarray) -> None:
+    verify_move_cache: bool = False
+    """调试用, 为 True 时每次使用缓存的移动列表, 都会与重新计算的结果进行对比"""
+
+    def __init__(self, blocks: list[Block], grid_mask: numpy.ndarray,
+                 placeable: Optional[frozenset[Point]] = None,
+                 inherited_shifts: Optional[tuple[Optional[tuple[Point, ...]], ...]] = None,
+                 moved_index: int = -1, moved_count: int = 0, moved_shift: Point = (0, 0)) -> None:
         self.grid_mask = numpy.array(grid_mask)
         """生成一个棋盘自身是否可以放置棋子的遮罩, 0代表不能放置, 1代表可以放置"""
         self.shape: tuple = grid_mask.shape # 棋盘的长和宽
         self.size: int = grid_mask.size
         self.action_space: int = self.size * self.size
         self.blocks: list[Block] = blocks
+        self.placeable: Optional[frozenset[Point]] = placeable
+        """placeable_cells 的缓存, 与 grid_mask 对应, take_action 生成的局面直接共享"""
+
+        # 以下为移动列表缓存, 由 take_action 通过构造函数传入, 搜索时大量创建的局面不需要在之后再设置属性
+        # 缓存只使用 tuple 和 int, 并且继承时直接共享父局面的 tuple, 不会增加垃圾回收需要追踪的对象
+        self.block_shifts: Optional[tuple[Optional[tuple[Point, ...]], ...]] = None
+        """与 blocks 一一对应的合法平移列表缓存, 第一次使用时为所有区块一起计算, inactive 的区块为 None"""
+        self.inherited_shifts: Optional[tuple[Optional[tuple[Point, ...]], ...]] = inherited_shifts
+        """take_action 从父局面继承的合法平移列表, 使用前需要检查是否受到了上一步移动的影响"""
+        self.moved_index: int = moved_index
+        """上一步被移动的区块在 blocks 中的位置"""
+        self.moved_count: int = moved_count
+        """上一步被移动的区块在合并之前的棋子数量, 合并时其他区块的棋子追加在后面, 所以前 moved_count 个棋子就是移动后的位置"""
+        self.moved_shift: Point = moved_shift
+        """上一步移动的距离"""
 
     def valid_actions(self) -> list[tuple[Block, Point]]:
         """
@@ -54,13 +75,100 @@ class Board:
         0,0,2,1
         """
         actions = []
-        active_blocks = [block for block in self.blocks if block.active]
+        for block, shifts in zip(self.blocks, self.all_shifts()):
+            if shifts:
+                actions += [(block, shift) for shift in shifts]
 
-        for block in active_blocks:
-            actions += self.valid_actions_by_block(block)
-            
         return actions
 
+    def all_shifts(self) -> tuple[Optional[tuple[Point, ...]], ...]:
+        """
+        所有 active 区块的合法平移, 与 blocks 一一对应, 优先复用从父局面继承的结果
+        """
+        if self.block_shifts is not None:
+            return self.block_shifts
+
+        inherited = self.inherited_shifts
+        if inherited is None:
+            self.block_shifts = tuple(tuple(self.shifts_by_block(block)) if block.active else None
+                                      for block in self.blocks)
+            return self.block_shifts
+
+        moved_color = self.blocks[self.moved_index].color
+        changed_cells = None
+        results: list[Optional[tuple[Point, ...]]] = []
+        for index, block in enumerate(self.blocks):
+            if not block.active:
+                results.append(None)
+                continue
+
+            # 同色的区块需要重新计算, 其他颜色的区块只有受到格子变化影响时才需要重新计算
+            # 没有同色区块的区块不能移动, 也不会受到影响
+            shifts = None if block.color == moved_color else inherited[index]
+            if shifts is not None:
+                same_color_blocks = [b for b in self.blocks if b.color == block.color and b is not block]
+                if same_color_blocks:
+                    if changed_cells is None:
+                        changed_cells = self.changed_cells()
+                    if self.shifts_may_change(block, same_color_blocks, changed_cells):
+                        shifts = None
+
+            if shifts is None:
+                shifts = tuple(self.shifts_by_block(block))
+            elif self.verify_move_cache:
+                expected = self.shifts_by_block(block)
+                if set(expected) != set(shifts):
+                    raise Exception(f"移动列表缓存错误, 区块 {block.pieces} 缓存为 {shifts}, 实际为 {expected}")
+            results.append(shifts)
+
+        self.block_shifts = tuple(results)
+        return self.block_shifts
+
+    def changed_cells(self) -> list[Point]:
+        """上一步空出的格子和新占用的格子"""
+        dx, dy = self.moved_shift
+        moved = self.blocks[self.moved_index].pieces[:self.moved_count]
+        return moved + [(x - dx, y - dy) for x, y in moved]
+
+    @staticmethod
+    def shifts_may_change(block: Block, same_color_blocks: list[Block], changed_cells: list[Point]) -> bool:
+        """
+        same_color_blocks 为除了 block 以外的同色区块
+        changed_cells 中的格子被占用或者空出之后, 区块 (颜色与被移动的区块不同) 的合法平移是否可能发生变化
+        区块平移后, 其中一个棋子 q 落在同色棋子 o 的相邻位置 o + d, 区块的任意棋子 p 落在 o + d + (p - q),
+        只有落在这些位置上的格子发生变化, 才会影响合法平移
+        """
+        offsets = Board.footprint_offsets(block)
+        for b in same_color_blocks:
+            for ox, oy in b.pieces:
+                for x, y in changed_cells:
+                    if (x - ox, y - oy) in offsets:
+                        return True
+        return False
+
+    @staticmethod
+    def footprint_offsets(block: Block) -> frozenset[Point]:
+        """
+        区块平移到同色棋子 o 的相邻位置时, 区块的棋子相对于 o 可能出现的所有位置
+        只与棋子之间的相对位置有关, 按区块的形状缓存, 缓存的大小只与出现过的形状数量有关
+        """
+        pieces = block.pieces
+        if len(pieces) == 1:
+            return NEIGHBOR_OFFSETS
+
+        # 按坐标排序后, 以第一个棋子为原点, 同一形状在任意位置、任意棋子顺序下都得到相同的 key
+        ordered = sorted(pieces)
+        origin_x, origin_y = ordered[0]
+        key = tuple([(x - origin_x, y - origin_y) for x, y in ordered])
+        offsets = FOOTPRINT_OFFSETS.get(key)
+        if offsets is None:
+            offsets = frozenset((dx + px - qx, dy + py - qy)
+                                for px, py in key
+                                for qx, qy in key
+                                for dx, dy in NEIGHBOR_OFFSETS)
+            FOOTPRINT_OFFSETS[key] = offsets
+        return offsets
+
     def valid_actions_parallel(self, workers=8) -> list[tuple[Block, Point]]:
         """
         valid_actions的多线程版本, 不推荐使用, 运行速度会比非多线程的版本慢
@@ -79,16 +187,27 @@ class Board:
         """
         找到单个区块所有合法的操作
         """
+        return [(block, shift) for shift in self.shifts_by_block(block)]
+
+    def shifts_by_block(self, block: Block) -> list[Point]:
+        """
+        找到单个区块所有合法的平移
+        """
         same_color_blocks = [b for b in self.blocks if b.color == block.color and b is not block]
         if not same_color_blocks:
             return []   # 没有其他同色区块可以拼接
 
-        actions = []
+        shifts = []
 
-        other_blocks = [b for b in self.blocks if b is not block]
-        piece_mask = self.build_piece_mask(other_blocks)
+        # 可以部署的格子: 在边界内, grid_mask 为 True, 并且没有被其他区块占用
+        # 用 set 代替 build_piece_mask 生成的 numpy 遮罩, 逐个格子查询时快很多
+        free_cells = set(self.placeable_cells())
+        for b in self.blocks:
+            if b is not block:
+                free_cells.difference_update(b.pieces)
 
         # 去重，例如 A,B,C 三个区块拼接时, A-B 的合法动作和 A-C的合法动作是同一个
+        # 不合法的平移也记录下来, 避免重复检查
         seen_shifts = set() 
 
         # 找到所有的同色区块，以及这些区块相邻的位置
@@ -99,11 +218,8 @@ class Board:
                 for dx, dy in ((-1, 0), (0, 1), (1, 0), (0, -1)):
                     adj_pos = (other_piece[0] + dx, other_piece[1] + dy)
 
-                    if not (0 <= adj_pos[0] < self.shape[0] and 0 <= adj_pos[1] < self.shape[1]):
-                        continue    # 不在边界内
-
-                    if (not piece_mask[adj_pos]) or (not self.grid_mask[adj_pos]):
-                        continue    # 相邻的位置不可部署
+                    if adj_pos not in free_cells:
+                        continue    # 不在边界内, 或者相邻的位置不可部署
 
                     for piece in block.pieces:
                         # 计算区块的偏移量
@@ -112,27 +228,27 @@ class Board:
 
                         if (shift_x, shift_y) in seen_shifts:
                             continue 
+                        seen_shifts.add((shift_x, shift_y))
 
                         if (shift_x == 0 and shift_y == 0):
                             continue    # 原地不动，正常逻辑不会出现这个区块
 
-                        valid_move = True
+                        # 保证区块整体移动时，所有的棋子都部署在合法的区域上面
                         for p in block.pieces:
-                            new_x, new_y = p[0] + shift_x, p[1] + shift_y
-
-                            # 保证区块整体移动时，所有的棋子都部署在合法的区域上面
-                            if not (0 <= new_x < self.shape[0] and 0 <= new_y < self.shape[1]):
-                                valid_move = False  
+                            if (p[0] + shift_x, p[1] + shift_y) not in free_cells:
                                 break
+                        else:
+                            shifts.append((shift_x, shift_y))
+        return shifts
 
-                            if (not self.grid_mask[new_x, new_y]) or (not piece_mask[new_x, new_y]):
-                                valid_move = False
-                                break
-
-                        if valid_move:
-                            seen_shifts.add((shift_x, shift_y))
-                            actions.append((block, (shift_x, shift_y)))
-        return actions
+    def placeable_cells(self) -> frozenset[Point]:
+        """
+        grid_mask 为 True 的所有格子, 第一次使用时计算, take_action 生成的局面直接共享
+        """
+        if self.placeable is None:
+            rows, cols = numpy.nonzero(self.grid_mask)
+            self.placeable = frozenset(zip(rows.tolist(), cols.tolist()))
+        return self.placeable
     
     def build_piece_mask(self, blocks: list[Block]) -> numpy.ndarray:
         """
@@ -162,9 +278,48 @@ class Board:
         for block in self.blocks:
             if not block.active:
                 return False
-            
+
         return True
 
+    def is_goal_adjacent(self) -> bool:
+        """
+        检验当前局面是否恰好再走一步就可以到达结束状态
+        移动颜色 c 的区块时, 其他颜色的区块不受影响, 没有被合并的同色区块会变为 active=False, 所以需要满足：
+            1. 除了某一个颜色 c 以外, 其他颜色都只有一个区块, 并且 active 都为 True
+            2. 颜色 c 有多个区块, 存在一个区块, 移动一次之后与其他所有颜色 c 的区块都相邻 (全部被合并)
+        """
+        blocks_by_color: dict[int, list[Block]] = {}
+        for block in self.blocks:
+            blocks_by_color.setdefault(block.color, []).append(block)
+
+        unfinished = [blocks for blocks in blocks_by_color.values() if len(blocks) > 1]
+        if len(unfinished) != 1:
+            return False
+        for blocks in blocks_by_color.values():
+            if len(blocks) == 1 and not blocks[0].active:
+                return False
+
+        same_color_blocks = unfinished[0]
+        for index, block in enumerate(self.blocks):
+            if block.color != same_color_blocks[0].color or not block.active:
+                continue
+            others = [b for b in same_color_blocks if b is not block]
+            for dx, dy in self.all_shifts()[index]:
+                moved = {(x + dx, y + dy) for x, y in block.pieces}
+                if all(any((x + ax, y + ay) in moved
+                           for x, y in other.pieces
+                           for ax, ay in ((-1, 0), (0, 1), (1, 0), (0, -1)))
+                       for other in others):
+                    return True
+        return False
+
+    def state_key(self) -> tuple:
+        """
+        局面的唯一标识, 区块的顺序不同但是棋子、颜色、active 都相同的两个局面的标识相同
+        用于搜索时去除重复的局面
+        """
+        return tuple(sorted((block.color, block.active, tuple(sorted(block.pieces))) for block in self.blocks))
+
     def take_action(self, block: Block, shift: tuple[int, int]) -> "Board":
         """
         执行动作, 将 block 平移 shift 的位置后, 移动到指定的地方, 
@@ -179,8 +334,9 @@ class Board:
         for b in self.blocks:
             new_pieces = list(b.pieces)  # 复制
             new_blocks.append(Block(new_pieces, b.color, b.active))
-        
-        target_block = new_blocks[self.blocks.index(block)]
+
+        moved_index = self.blocks.index(block)
+        target_block = new_blocks[moved_index]
         
         if target_block is None:
             return self
@@ -193,7 +349,7 @@ class Board:
             x, y = piece
             new_x, new_y = x + dx, y + dy
             new_pieces.append((new_x, new_y))
-            
+
         target_block.pieces = new_pieces
         
         # 合并相邻的同色区块
@@ -211,18 +367,32 @@ class Board:
                 if block in blocks_to_merge:
                     break
         
+        # 与 new_blocks 一一对应, 没有发生合并时直接共享父局面的缓存
+        inherited_shifts = self.block_shifts
+        moved_count = len(new_pieces)
         for block in blocks_to_merge:
             target_block.merge(block)
-            new_blocks.remove(block)
+            index = new_blocks.index(block)
+            del new_blocks[index]
+            if index < moved_index:
+                moved_index -= 1
+            if inherited_shifts is not None:
+                inherited_shifts = inherited_shifts[:index] + inherited_shifts[index + 1:]
             
         # 更新区块的 active, 同色区块 active 为 False, 只保留 target_block 的 active 为 True
-        for block in new_blocks:
+        # 其他颜色的 active 区块在父局面中有合法平移时, 继承父局面的移动列表才有意义
+        reusable = False
+        for index, block in enumerate(new_blocks):
             if block.color == target_block.color:
                 block.active = False
+            elif block.active and inherited_shifts is not None and inherited_shifts[index]:
+                reusable = True
         target_block.active = True
 
-        # 创建并返回新的 Board 实例
-        new_board = Board(new_blocks, self.grid_mask.copy())
+        # 创建并返回新的 Board 实例, Board 的构造函数会复制 grid_mask
+        # 继承父局面的移动列表, 在 all_shifts 中按需检查是否需要重新计算
+        new_board = Board(new_blocks, self.grid_mask, self.placeable,
+                          inherited_shifts if reusable else None, moved_index, moved_count, shift)
         return new_board
 
     def find_block_by_coord(self, coord: Point) -> Optional[Block]:
@@ -234,35 +404,87 @@ class Board:
                 break
         return target_block
     
+    def build_cell_index(self) -> dict[Point, Block]:
+        """
+        生成 坐标 -> 区块 的索引, 用于 O(1) 查找某个坐标上的区块
+        没有棋子的坐标不在索引中
+        """
+        index: dict[Point, Block] = {}
+        for block in self.blocks:
+            for piece in block.pieces:
+                index[piece] = block
+        return index
+
     @staticmethod
     def build_grid_mask(board: numpy.ndarray) -> numpy.ndarray:
         mask = numpy.full(board.shape, fill_value=True, dtype=bool)
         mask[board < 0] = False
         return mask
 
+    @staticmethod
+    def label_components(board: numpy.ndarray) -> numpy.ndarray:
+        """
+        用 numpy 批量计算连通区域, 代替逐个格子的 BFS
+        每个棋子标记为所在区块中 (按行优先顺序) 第一个棋子的一维坐标, 没有棋子的地方为 -1
+
+        Example
+        -------
+        棋盘的设定为：
+            1,2,1,1
+            1,1,1,0
+        则返回：
+            0,1,0,0
+            0,0,0,-1
+        """
+        height, width = board.shape
+        occupied = board > 0
+        empty_label = height * width
+        labels = numpy.where(occupied, numpy.arange(height * width).reshape(board.shape), empty_label)
+
+        # 上下、左右相邻并且颜色相同的棋子
+        same_v = occupied[1:, :] & (board[1:, :] == board[:-1, :])
+        same_h = occupied[:, 1:] & (board[:, 1:] == board[:, :-1])
+
+        # 不断把相邻同色棋子的标记更新为较小的值, 直到不再变化
+        while True:
+            new_labels = labels.copy()
+            numpy.minimum(new_labels[1:, :], numpy.where(same_v, labels[:-1, :], empty_label), out=new_labels[1:, :])
+            numpy.minimum(new_labels[:-1, :], numpy.where(same_v, labels[1:, :], empty_label), out=new_labels[:-1, :])
+            numpy.minimum(new_labels[:, 1:], numpy.where(same_h, labels[:, :-1], empty_label), out=new_labels[:, 1:])
+            numpy.minimum(new_labels[:, :-1], numpy.where(same_h, labels[:, 1:], empty_label), out=new_labels[:, :-1])
+            # 标记指向的棋子与自身在同一个区块中, 直接跳到它的标记, 加快收敛
+            flat = numpy.append(new_labels.ravel(), empty_label)
+            new_labels = flat[new_labels]
+            if numpy.array_equal(new_labels, labels):
+                break
+            labels = new_labels
+
+        labels[~occupied] = -1
+        return labels
+
     @staticmethod
     def build_blocks(board: numpy.ndarray) -> list[Block]:
         """
-        计算所有相互连接的区块
+        计算所有相互连接的区块, 区块按照第一个棋子的行优先顺序排列
         """
+        labels = Board.label_components(board).ravel()
+        indices = numpy.flatnonzero(labels >= 0)
+        # 按标记分组, 标记相同的棋子保持行优先顺序
+        indices = indices[numpy.argsort(labels[indices], kind="stable")]
+        sorted_labels = labels[indices]
+        boundaries = numpy.flatnonzero(numpy.diff(sorted_labels)) + 1
+
         results: list[Block] = []
-        visited = numpy.zeros(board.shape, dtype=bool)
-        
-        for row in range(board.shape[0]):
-            for col in range(board.shape[1]):
-                if visited[row, col] or board[row, col] <= 0:
-                    continue
-                    
-                connected_pieces = Board.get_connected_pieces(board, (row, col))
-                color = board[row, col]
-                new_block = Block(connected_pieces, color, True)
-                results.append(new_block)
-                
-                for r, c in connected_pieces:
-                    visited[r, c] = True
+        width = board.shape[1]
+        for group in numpy.split(indices, boundaries):
+            if len(group) == 0:
+                continue
+            rows, cols = numpy.divmod(group, width)
+            connected_pieces: list[Point] = list(zip(rows.tolist(), cols.tolist()))
+            color = board[rows[0], cols[0]]
+            results.append(Block(connected_pieces, color, True))
         return results
 
-
     @staticmethod
     def get_connected_pieces(board: numpy.ndarray, coord: Point) -> list[Point]:
         """
@@ -315,54 +537,9 @@ class Board:
         图片中, grid_mask 为 False 的区域为黑色, True 的地方为白色
         有棋子的地方, 用圆圈代表棋子, 并且圆圈的颜色代表棋子的颜色
         """
-        # 创建空白图像
-        height, width = self.shape
-        img = numpy.ones((height * grid_size, width * grid_size, 3), dtype=numpy.uint8) * 255
-            
-        # 绘制网格遮罩
-        for i in range(height):
-            for j in range(width):
-                if not self.grid_mask[i, j]:
-                    # 不可放置区域, 绘制为黑色
-                    cv2.rectangle(img, 
-                                (j * grid_size, i * grid_size),
-                                ((j + 1) * grid_size, (i + 1) * grid_size),
-                                (0, 0, 0), -1)
-                else:
-                    # 可放置区域, 绘制为白色 (已经是白色, 只需绘制网格线) 
-                    cv2.rectangle(img,
-                                (j * grid_size, i * grid_size),
-                                ((j + 1) * grid_size, (i + 1) * grid_size),
-                                (200, 200, 200), 1)
-                    
-        # 绘制连线
-        for block in self.blocks:
-            for piece in block.pieces:
-                x, y = piece
-                center = (y * grid_size + grid_size // 2, x * grid_size + grid_size // 2)
-                
-                # 上、右、下、左四个方向
-                for dx, dy in [(-1, 0), (0, 1), (1, 0), (0, -1)]:
-                    nx, ny = x + dx, y + dy
-                    if (nx, ny) in block.pieces:
-                        # 找到相邻棋子，绘制灰色的线段
-                        neighbor_center = (ny * grid_size + grid_size // 2, nx * grid_size + grid_size // 2)
-                        cv2.line(img, center, neighbor_center, (80, 80, 80), 4)
-
-        # 绘制棋子
-        for block in self.blocks:
-            color = COLORS[block.color % len(COLORS)]
-            for piece in block.pieces:
-                x, y = piece
-                center = (y * grid_size + grid_size // 2, x * grid_size + grid_size // 2)
-                radius = grid_size // 3
-                
-                cv2.circle(img, center, radius, color, -1)
-                
-                # 如果区块是活跃的, 绘制外框
-                if block.active:
-                    cv2.circle(img, center, radius + 2, (0, 0, 0), 2)
-        return img
+        # 渲染依赖 cv2 和 PIL, 只在需要时导入, 避免无界面的求解也要付出导入的开销
+        from render.renderer import get_renderer
+        return get_renderer(grid_size).render(self)
 
     @classmethod
     def build_from_array(cls, arr: numpy.ndarray):